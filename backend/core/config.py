@@ -3,38 +3,152 @@
 Centralizes environment-driven settings for models and external services.
 """
 
+import functools
 import os
 
 from dotenv import load_dotenv
 
+EMBEDDING_BACKENDS = ("torch", "onnx", "openvino")
+EMBEDDING_PRECISIONS = ("fp32", "bf16", "fp16")
 
-load_dotenv()
+
+@functools.lru_cache(maxsize=1)
+def _ensure_env_loaded() -> None:
+    """Load the .env file once per process."""
+    load_dotenv()
+
+
+def _env(key: str, default: str = None) -> str:
+    """Read an environment variable after making sure .env is loaded."""
+    _ensure_env_loaded()
+    return os.getenv(key, default)
+
+
+def _env_flag(key: str, default: str = "false") -> bool:
+    """Read a boolean environment variable ("1", "true", "yes" are truthy)."""
+    return _env(key, default).strip().lower() in ("1", "true", "yes")
 
 
 class Settings:
-    """Simple container for environment-backed settings."""
+    """Simple container for environment-backed settings.
+
+    Values are read lazily on first access and cached on the instance.
+    """
 
     # API Keys
-    OPENAI_API_KEY: str = os.getenv("OPENAI_API_KEY")
-    PINECONE_API_KEY: str = os.getenv("PINECONE_API_KEY")
-    PINECONE_ENVIRONMENT: str = os.getenv("PINECONE_ENVIRONMENT", "us-east-1")
+    @functools.cached_property
+    def OPENAI_API_KEY(self) -> str:
+        return _env("OPENAI_API_KEY")
+
+    @functools.cached_property
+    def PINECONE_API_KEY(self) -> str:
+        return _env("PINECONE_API_KEY")
+
+    @functools.cached_property
+    def PINECONE_ENVIRONMENT(self) -> str:
+        return _env("PINECONE_ENVIRONMENT", "us-east-1")
 
     # Database and Storage
-    UPLOAD_DIRECTORY: str = os.getenv("UPLOAD_DIRECTORY", "uploads/")
-    DATASET_DIRECTORY: str = os.getenv("DATASET_DIRECTORY", "datasets/")
+    @functools.cached_property
+    def UPLOAD_DIRECTORY(self) -> str:
+        return _env("UPLOAD_DIRECTORY", "uploads/")
+
+    @functools.cached_property
+    def DATASET_DIRECTORY(self) -> str:
+        return _env("DATASET_DIRECTORY", "datasets/")
+
+    @functools.cached_property
+    def PRODUCT_MIRROR_PATH(self) -> str:
+        # Local Parquet copy of upserted product metadata + embeddings
+        return _env("PRODUCT_MIRROR_PATH", "data/products.parquet")
+
+    @functools.cached_property
+    def MIRROR_EMBEDDING_DTYPE(self) -> str:
+        # "float32" or "int8" (per-row scaled, ~4x smaller)
+        return _env("MIRROR_EMBEDDING_DTYPE", "float32").lower()
 
     # Model Configuration
-    EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
-    GENAI_MODEL: str = os.getenv("GENAI_MODEL", "gpt2")
+    @functools.cached_property
+    def EMBEDDING_MODEL(self) -> str:
+        return _env("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+
+    @functools.cached_property
+    def EMBEDDING_BACKEND(self) -> str:
+        # "torch", "onnx" or "openvino" (INT8 exports; require sentence-transformers[onnx]/[openvino])
+        backend = _env("EMBEDDING_BACKEND", "torch").lower()
+        if backend not in EMBEDDING_BACKENDS:
+            raise ValueError(f"EMBEDDING_BACKEND must be one of {EMBEDDING_BACKENDS}, got '{backend}'")
+        return backend
+
+    @functools.cached_property
+    def EMBEDDING_PRECISION(self) -> str:
+        # "fp32", "bf16" or "fp16". On AMX CPUs prefer bf16 over the INT8 backends,
+        # which only pay off on pre-AMX hardware
+        precision = _env("EMBEDDING_PRECISION", "fp32").lower()
+        if precision not in EMBEDDING_PRECISIONS:
+            raise ValueError(f"EMBEDDING_PRECISION must be one of {EMBEDDING_PRECISIONS}, got '{precision}'")
+        return precision
+
+    @functools.cached_property
+    def EMBEDDING_MAX_SEQ_LENGTH(self) -> int:
+        # Token cap for embedding inputs (longer text is truncated); 0 keeps the model default
+        return int(_env("EMBEDDING_MAX_SEQ_LENGTH", "0"))
+
+    @functools.cached_property
+    def TORCH_NUM_THREADS(self) -> int:
+        # Intra-op threads per process; set to cores // workers when running several
+        # uvicorn workers to avoid oversubscription. 0 keeps torch's default
+        return int(_env("TORCH_NUM_THREADS", "0"))
+
+    @functools.cached_property
+    def GENAI_MODEL(self) -> str:
+        return _env("GENAI_MODEL", "gpt2")
+
+    @functools.cached_property
+    def GENAI_DRAFT_MODEL(self) -> str:
+        # Small draft model for assisted (speculative) decoding, e.g. "distilgpt2"; empty disables
+        return _env("GENAI_DRAFT_MODEL", "")
+
+    @functools.cached_property
+    def GENAI_BACKEND(self) -> str:
+        # "torch" or "onnx" (ONNX Runtime INT8; requires optimum[onnxruntime])
+        return _env("GENAI_BACKEND", "torch").lower()
+
+    @functools.cached_property
+    def QUANTIZE_GENAI(self) -> bool:
+        return _env_flag("QUANTIZE_GENAI")
+
+    @functools.cached_property
+    def ENABLE_COMPILE(self) -> bool:
+        # torch.compile the GPT-2 forward pass (torch backend only)
+        return _env_flag("ENABLE_COMPILE")
+
+    @functools.cached_property
+    def MODEL_CACHE_DIRECTORY(self) -> str:
+        return _env("MODEL_CACHE_DIRECTORY", "model_cache/")
 
     # Pinecone Configuration
-    PINECONE_INDEX_NAME: str = os.getenv("PINECONE_INDEX_NAME", "furniture-products")
-    EMBEDDING_DIMENSION: int = int(os.getenv("EMBEDDING_DIMENSION", "384"))
+    @functools.cached_property
+    def PINECONE_INDEX_NAME(self) -> str:
+        return _env("PINECONE_INDEX_NAME", "furniture-products")
+
+    @functools.cached_property
+    def EMBEDDING_DIMENSION(self) -> int:
+        return int(_env("EMBEDDING_DIMENSION", "384"))
 
     # Recommendation Settings
-    DEFAULT_TOP_K: int = int(os.getenv("DEFAULT_TOP_K", "5"))
-    SIMILARITY_THRESHOLD: float = float(os.getenv("SIMILARITY_THRESHOLD", "0.3"))
+    @functools.cached_property
+    def DEFAULT_TOP_K(self) -> int:
+        return int(_env("DEFAULT_TOP_K", "5"))
 
+    @functools.cached_property
+    def SIMILARITY_THRESHOLD(self) -> float:
+        return float(_env("SIMILARITY_THRESHOLD", "0.3"))
+
+    # Analytics Settings
+    @functools.cached_property
+    def ANALYTICS_CACHE_TTL(self) -> float:
+        return float(_env("ANALYTICS_CACHE_TTL", "60"))
 
-settings = Settings()
 
+settings = Settings()
@@ -8,22 +8,30 @@ from typing import Optional
 
 from fastapi import Depends, HTTPException, status
 
-def get_upload_directory() -> str:
+from core.config import settings
+
+# Resolved once per process; directories only need to be created on first use
+_UPLOAD_DIR: Optional[str] = None
+_DATASET_DIR: Optional[str] = None
+
+async def get_upload_directory() -> str:
     """Resolve (and create) the upload directory path."""
-    upload_dir = os.getenv("UPLOAD_DIRECTORY", "uploads/")
-    os.makedirs(upload_dir, exist_ok=True)
-    return upload_dir
+    global _UPLOAD_DIR
+    if _UPLOAD_DIR is None:
+        os.makedirs(settings.UPLOAD_DIRECTORY, exist_ok=True)
+        _UPLOAD_DIR = settings.UPLOAD_DIRECTORY
+    return _UPLOAD_DIR
 
-def get_dataset_directory() -> str:
+async def get_dataset_directory() -> str:
     """Resolve (and create) the dataset directory path."""
-    dataset_dir = os.getenv("DATASET_DIRECTORY", "datasets/")
-    os.makedirs(dataset_dir, exist_ok=True)
-    return dataset_dir
+    global _DATASET_DIR
+    if _DATASET_DIR is None:
+        os.makedirs(settings.DATASET_DIRECTORY, exist_ok=True)
+        _DATASET_DIR = settings.DATASET_DIRECTORY
+    return _DATASET_DIR
 
 def validate_api_keys():
     """Validate that required API keys are present."""
-    from core.config import settings
-    
     if not settings.PINECONE_API_KEY:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -31,4 +39,3 @@ def validate_api_keys():
         )
     
     return True
-
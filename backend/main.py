@@ -3,19 +3,30 @@
 Sets up CORS, health checks, and mounts product and analytics routers.
 """
 
+import logging
+
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 
-# Local routers
+# Local routers and services
 from routers import products, analytics
+from services.analytics_service import analytics_service
+from services.product_service import product_service
+
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Product Recommendation API", version="1.0.0")
+app = FastAPI(
+    title="Product Recommendation API",
+    version="1.0.0",
+    default_response_class=ORJSONResponse,
+)
 
 origins = [
-    # Development origins; keep permissive for local iteration
-    "http://localhost:3000/",
-    "http://localhost:3001/",
-    "*",  # TODO: tighten CORS in production
+    # Development origins; browsers send Origin without a trailing slash
+    "http://localhost:3000",
+    "http://localhost:3001",
 ]
 
 app.add_middleware(
@@ -24,8 +35,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Shape"],  # embedding matrix shape for /api/products/embeddings
+    max_age=86400,  # let browsers cache preflight responses for a day
 )
 
+@app.on_event("startup")
+async def warm_services():
+    """Warm service singletons so the first user request sees steady-state latency."""
+    # Each step is independent: an unreachable Pinecone must not skip encoder warm-up
+    warmup_steps = [
+        ("Pinecone index", product_service.get_index),
+        ("embedding model", lambda: product_service.generate_embeddings(["warmup"] * 4)),
+        ("analytics metrics", analytics_service.get_analytics_metrics),
+    ]
+    for name, step in warmup_steps:
+        try:
+            await run_in_threadpool(step)
+        except Exception as e:
+            # Never block startup on warm-up; requests will retry lazily
+            logger.warning("Warm-up of %s failed: %s", name, e)
+
 @app.get("/")
 async def read_root():
     """Basic service descriptor for quick smoke tests."""
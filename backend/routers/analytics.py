@@ -6,6 +6,8 @@ Provides endpoints for embeddings visualization and system analytics.
 from typing import Dict, List, Optional
 
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
 
 # Local services
@@ -13,7 +15,8 @@ from services.analytics_service import analytics_service
 
 router = APIRouter()
 
-# Pydantic models for response
+# Pydantic models for response; used for OpenAPI docs only, results are
+# returned as plain dicts to skip per-field re-validation
 class Embedding2DResponse(BaseModel):
     coordinates: List[List[float]]
     metadata: List[Dict]
@@ -37,36 +40,37 @@ class SimilarityAnalysisResponse(BaseModel):
     category_distribution: Dict[str, int]
     price_similarity: Dict
 
-@router.get("/embeddings-2d")
+@router.get("/embeddings-2d", response_model=None, responses={200: {"model": Embedding2DResponse}})
 async def get_embeddings_2d(
     method: str = Query("pca", regex="^(pca|tsne)$"),
     n_components: int = Query(2, ge=2, le=3)
 ):
     """Get 2D coordinates for embedding visualization."""
     try:
-        result = analytics_service.get_embeddings_2d(
+        result = await run_in_threadpool(
+            analytics_service.get_embeddings_2d,
             method=method,
             n_components=n_components
         )
-        return Embedding2DResponse(**result)
+        return ORJSONResponse(result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/metrics")
+@router.get("/metrics", response_model=None, responses={200: {"model": AnalyticsMetricsResponse}})
 async def get_analytics_metrics():
     """Get comprehensive analytics metrics."""
     try:
-        metrics = analytics_service.get_analytics_metrics()
-        return AnalyticsMetricsResponse(**metrics)
+        metrics = await run_in_threadpool(analytics_service.get_analytics_metrics)
+        return ORJSONResponse(metrics)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/similarity/{product_id}")
+@router.get("/similarity/{product_id}", response_model=None, responses={200: {"model": SimilarityAnalysisResponse}})
 async def get_similarity_analysis(product_id: str):
     """Analyze similarity patterns for a specific product."""
     try:
-        analysis = analytics_service.get_similarity_analysis(product_id)
-        return SimilarityAnalysisResponse(**analysis)
+        analysis = await run_in_threadpool(analytics_service.get_similarity_analysis, product_id)
+        return ORJSONResponse(analysis)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -74,7 +78,7 @@ async def get_similarity_analysis(product_id: str):
 async def get_recommendation_quality():
     """Get recommendation quality metrics."""
     try:
-        quality_metrics = analytics_service.get_recommendation_quality_metrics()
+        quality_metrics = await run_in_threadpool(analytics_service.get_recommendation_quality_metrics)
         return quality_metrics
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -83,11 +87,11 @@ async def get_recommendation_quality():
 async def get_category_analytics():
     """Get detailed analytics for each category."""
     try:
-        metrics = analytics_service.get_analytics_metrics()
+        stats = await run_in_threadpool(analytics_service.get_category_stats)
         return {
-            "category_insights": metrics.get("category_insights", {}),
-            "category_distribution": metrics.get("categories", {}),
-            "total_categories": len(metrics.get("categories", {}))
+            "category_insights": stats["category_insights"],
+            "category_distribution": stats["categories"],
+            "total_categories": len(stats["categories"])
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -96,14 +100,15 @@ async def get_category_analytics():
 async def get_price_analysis():
     """Get detailed price analysis."""
     try:
-        metrics = analytics_service.get_analytics_metrics()
+        stats = await run_in_threadpool(analytics_service.get_price_stats)
+        price_ranges = stats["price_ranges"]
         return {
-            "price_statistics": metrics.get("price_statistics", {}),
-            "price_ranges": metrics.get("price_ranges", {}),
+            "price_statistics": stats["price_statistics"],
+            "price_ranges": price_ranges,
             "price_insights": {
-                "budget_products": metrics.get("price_ranges", {}).get("budget", 0),
-                "mid_range_products": metrics.get("price_ranges", {}).get("mid_range", 0),
-                "premium_products": metrics.get("price_ranges", {}).get("premium", 0)
+                "budget_products": price_ranges.get("budget", 0),
+                "mid_range_products": price_ranges.get("mid_range", 0),
+                "premium_products": price_ranges.get("premium", 0)
             }
         }
     except Exception as e:
@@ -113,10 +118,9 @@ async def get_price_analysis():
 async def get_recommendation_insights():
     """Get insights about the recommendation system performance."""
     try:
-        metrics = analytics_service.get_analytics_metrics()
         return {
-            "recommendation_insights": metrics.get("recommendation_insights", {}),
-            "quality_metrics": analytics_service.get_recommendation_quality_metrics()
+            "recommendation_insights": analytics_service.get_recommendation_insights(),
+            "quality_metrics": await run_in_threadpool(analytics_service.get_recommendation_quality_metrics)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
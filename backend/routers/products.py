@@ -3,21 +3,29 @@
 Handles dataset uploads, product retrieval, recommendations, and GenAI endpoints.
 """
 
+import hashlib
 import os
 import json
 from typing import List, Dict, Optional
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Depends
+import aiofiles
+import numpy as np
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Query, Depends, Response
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 
 # Local services and dependencies
 from core.dependencies import get_dataset_directory
+from services.analytics_service import analytics_service
 from services.genai_service import genai_service
 from services.product_service import product_service
 from services.recommendation_service import recommendation_service
 
 router = APIRouter()
 
+# Read uploads 1 MiB at a time so memory stays flat for large datasets
+UPLOAD_CHUNK_SIZE = 1 << 20
+
 # Pydantic models for request/response
 class RecommendationRequest(BaseModel):
     query: str
@@ -39,6 +47,7 @@ class ProductResponse(BaseModel):
 class GenerateDescriptionRequest(BaseModel):
     product_id: str
     enhance_existing: bool = False
+    category_specific: bool = False
 
 class GenerateDescriptionResponse(BaseModel):
     product_id: str
@@ -60,17 +69,19 @@ async def upload_dataset(
                 detail="Only CSV and JSON files are supported"
             )
         
-        # Persist upload for downstream processing
+        # Stream upload to disk in chunks, hashing as we go
         file_path = os.path.join(dataset_dir, file.filename)
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        digest = hashlib.sha256()
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                await buffer.write(chunk)
         
-        # Load and process dataset
-        products = product_service.load_dataset(file_path)
+        # Load and process dataset (parsing and ingest block, so keep them off the event loop)
+        products = await run_in_threadpool(product_service.load_dataset, file_path)
         
         # Store in Pinecone
-        success = product_service.store_products_in_pinecone(products)
+        success = await run_in_threadpool(product_service.store_products_in_pinecone, products)
         
         if not success:
             raise HTTPException(
@@ -78,11 +89,15 @@ async def upload_dataset(
                 detail="Failed to store products in vector database"
             )
         
+        # New products invalidate any cached analytics
+        analytics_service.clear_cache()
+        
         return {
             "message": "Dataset uploaded and processed successfully",
             "filename": file.filename,
             "products_processed": len(products),
-            "file_path": file_path
+            "file_path": file_path,
+            "sha256": digest.hexdigest()
         }
         
     except Exception as e:
@@ -105,19 +120,6 @@ async def get_all_products(
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/{product_id}")
-async def get_product(product_id: str):
-    """Get a specific product by ID."""
-    try:
-        product = product_service.get_product_by_id(product_id)
-        if not product:
-            raise HTTPException(status_code=404, detail="Product not found")
-        return product
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
-
 @router.post("/recommend")
 async def get_recommendations(request: RecommendationRequest):
     """Get product recommendations based on query and filters."""
@@ -214,13 +216,19 @@ async def generate_product_description(request: GenerateDescriptionRequest):
         
         # Generate description
         if request.enhance_existing and product.get('description'):
-            generated_description = genai_service.enhance_existing_description(
+            generated_description = await genai_service.enhance_existing_description(
                 product_name=product['name'],
                 original_description=product['description']
             )
             enhancement_type = "enhanced"
+        elif request.category_specific:
+            generated_description = await genai_service.generate_category_specific_description(
+                product_name=product['name'],
+                category=product.get('category', '')
+            )
+            enhancement_type = "category_specific"
         else:
-            generated_description = genai_service.generate_creative_description(
+            generated_description = await genai_service.generate_creative_description(
                 product_name=product['name'],
                 category=product.get('category', ''),
                 original_description=product.get('description', ''),
@@ -242,15 +250,46 @@ async def generate_product_description(request: GenerateDescriptionRequest):
 
 @router.get("/embeddings")
 async def get_embeddings_for_analytics():
-    """Get embeddings for analytics visualization."""
+    """Get embeddings for analytics visualization as raw float32 bytes.
+    
+    The body is a row-major little-endian float32 matrix; its shape is sent
+    in the ``X-Shape`` header as ``rows,cols``. Metadata is served separately
+    by ``/embeddings/metadata``.
+    """
+    try:
+        embeddings, _ = product_service.get_embeddings_for_analytics()
+        embeddings = np.ascontiguousarray(embeddings, dtype='<f4')
+        return Response(
+            content=embeddings.tobytes(),
+            media_type="application/octet-stream",
+            headers={"X-Shape": f"{embeddings.shape[0]},{embeddings.shape[1]}"}
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/embeddings/metadata")
+async def get_embeddings_metadata():
+    """Get metadata matching the rows returned by /embeddings."""
     try:
         embeddings, metadata = product_service.get_embeddings_for_analytics()
         return {
-            "embeddings": embeddings.tolist(),
             "metadata": metadata,
-            "dimension": len(embeddings[0]) if len(embeddings) > 0 else 0,
+            "dimension": embeddings.shape[1] if len(embeddings) > 0 else 0,
             "total_products": len(embeddings)
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Declared last so the static routes above are not captured as product IDs
+@router.get("/{product_id}")
+async def get_product(product_id: str):
+    """Get a specific product by ID."""
+    try:
+        product = product_service.get_product_by_id(product_id)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return product
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
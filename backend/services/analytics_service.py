@@ -3,6 +3,10 @@
 Aggregates product data and computes lightweight analytics for the UI.
 """
 
+import hashlib
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Tuple, Optional
 
 import numpy as np
@@ -15,16 +19,46 @@ from core.config import settings
 from services.product_service import product_service
 from services.recommendation_service import recommendation_service
 
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the budget and mid-range price buckets; anything above is premium
+PRICE_RANGE_EDGES = np.array([200.0, 800.0])
+
 class AnalyticsService:
     def __init__(self):
         self.product_service = product_service
         self.recommendation_service = recommendation_service
+        # (timestamp, result) pairs reused until ANALYTICS_CACHE_TTL expires
+        self._products_cache: Optional[Tuple[float, pd.DataFrame]] = None
+        self._embeddings_2d_cache: Dict[Tuple[str, int], Tuple[float, Dict]] = {}
+        # (embedding checksum, fitted reducer, coordinates) per (method, n_components)
+        self._projection_cache: Dict[Tuple[str, int], Tuple[str, object, np.ndarray]] = {}
+    
+    def clear_cache(self):
+        """Drop cached analytics so the next call recomputes from fresh data."""
+        self._products_cache = None
+        self._embeddings_2d_cache.clear()
+    
+    def _is_fresh(self, cached: Optional[Tuple[float, object]]) -> bool:
+        """Check whether a cached (timestamp, result) pair is still within the TTL."""
+        return cached is not None and time.monotonic() - cached[0] < settings.ANALYTICS_CACHE_TTL
     
     def get_embeddings_2d(self, method: str = "pca", n_components: int = 2) -> Dict:
         """Get 2D coordinates for embedding visualization."""
+        key = (method.lower(), n_components)
+        cached = self._embeddings_2d_cache.get(key)
+        if self._is_fresh(cached):
+            return cached[1]
+        
+        result = self._compute_embeddings_2d(method, n_components)
+        self._embeddings_2d_cache[key] = (time.monotonic(), result)
+        return result
+    
+    def _compute_embeddings_2d(self, method: str, n_components: int) -> Dict:
+        """Project product embeddings down to n_components dimensions."""
         try:
-            # Get all products and their metadata
-            all_products = self.product_service.get_all_products(limit=1000)
+            # Persisted product embeddings and their metadata
+            embeddings, all_products = self.product_service.get_embeddings_for_analytics()
             
             if not all_products:
                 return {
@@ -34,20 +68,32 @@ class AnalyticsService:
                     'n_components': n_components
                 }
             
-            # Generate dummy embeddings for visualization only.
-            # In production, retrieve persisted embeddings instead.
-            n_products = len(all_products)
-            dummy_embeddings = np.random.randn(n_products, settings.EMBEDDING_DIMENSION)
-            
-            # Apply dimensionality reduction
-            if method.lower() == "pca":
-                reducer = PCA(n_components=n_components, random_state=42)
-                coordinates = reducer.fit_transform(dummy_embeddings)
-            elif method.lower() == "tsne":
-                reducer = TSNE(n_components=n_components, random_state=42, perplexity=min(30, n_products-1))
-                coordinates = reducer.fit_transform(dummy_embeddings)
+            # Reuse the fitted projection while the embedding set is unchanged
+            checksum = hashlib.sha1(np.ascontiguousarray(embeddings).tobytes()).hexdigest()
+            key = (method.lower(), n_components)
+            cached = self._projection_cache.get(key)
+            if cached and cached[0] == checksum:
+                reducer, coordinates = cached[1], cached[2]
             else:
-                raise ValueError("Method must be 'pca' or 'tsne'")
+                n_products = len(all_products)
+                
+                # Apply dimensionality reduction
+                if method.lower() == "pca":
+                    reducer = PCA(n_components=n_components, random_state=42)
+                    coordinates = reducer.fit_transform(embeddings)
+                elif method.lower() == "tsne":
+                    reducer = TSNE(
+                        n_components=n_components,
+                        random_state=42,
+                        perplexity=min(30, n_products-1),
+                        method='barnes_hut',
+                        n_jobs=-1
+                    )
+                    coordinates = reducer.fit_transform(embeddings)
+                else:
+                    raise ValueError("Method must be 'pca' or 'tsne'")
+                
+                self._projection_cache[key] = (checksum, reducer, coordinates)
             
             # Prepare metadata for visualization
             metadata = []
@@ -66,19 +112,36 @@ class AnalyticsService:
                 'metadata': metadata,
                 'method': method,
                 'n_components': n_components,
-                'explained_variance_ratio': getattr(reducer, 'explained_variance_ratio_', None)
+                'explained_variance_ratio': reducer.explained_variance_ratio_.tolist() if method.lower() == "pca" else None
             }
             
         except Exception as e:
             raise Exception(f"Error getting 2D embeddings: {str(e)}")
     
+    def _get_products_frame(self) -> pd.DataFrame:
+        """Get a cached columnar (category, price) view of all products.
+        
+        Missing categories become 'Unknown'; missing or zero prices become NaN
+        so they are excluded from price statistics.
+        """
+        if self._is_fresh(self._products_cache):
+            return self._products_cache[1]
+        
+        all_products = self.product_service.get_all_products(limit=1000)
+        df = pd.DataFrame(all_products)
+        category_col = df['category'].fillna('Unknown') if 'category' in df else pd.Series('Unknown', index=df.index)
+        price_col = pd.to_numeric(df['price'], errors='coerce') if 'price' in df else pd.Series(np.nan, index=df.index)
+        frame = pd.DataFrame({'category': category_col, 'price': price_col.where(price_col != 0)})
+        
+        self._products_cache = (time.monotonic(), frame)
+        return frame
+    
     def get_analytics_metrics(self) -> Dict:
         """Get comprehensive analytics metrics."""
         try:
-            # Get all products
-            all_products = self.product_service.get_all_products(limit=1000)
+            df = self._get_products_frame()
             
-            if not all_products:
+            if df.empty:
                 return {
                     'total_products': 0,
                     'categories': {},
@@ -86,59 +149,80 @@ class AnalyticsService:
                     'recommendation_insights': {}
                 }
             
-            # Basic statistics
-            total_products = len(all_products)
-            
-            # Category distribution
-            categories = {}
-            for product in all_products:
-                category = product.get('category', 'Unknown')
-                categories[category] = categories.get(category, 0) + 1
-            
-            # Price statistics
-            prices = [product.get('price', 0) for product in all_products if product.get('price')]
-            price_stats = {
-                'min': float(np.min(prices)) if prices else 0,
-                'max': float(np.max(prices)) if prices else 0,
-                'mean': float(np.mean(prices)) if prices else 0,
-                'median': float(np.median(prices)) if prices else 0,
-                'std': float(np.std(prices)) if prices else 0
+            return {
+                'total_products': len(df),
+                **self.get_category_stats(),
+                **self.get_price_stats(),
+                'recommendation_insights': self.get_recommendation_insights()
             }
             
-            # Price ranges
-            price_ranges = {
-                'budget': len([p for p in prices if p < 200]),
-                'mid_range': len([p for p in prices if 200 <= p < 800]),
-                'premium': len([p for p in prices if p >= 800])
-            }
+        except Exception as e:
+            raise Exception(f"Error getting analytics metrics: {str(e)}")
+    
+    def get_category_stats(self) -> Dict:
+        """Get the category distribution and per-category price insights."""
+        try:
+            df = self._get_products_frame()
+            total_products = len(df)
+            
+            # Category distribution
+            categories = {category: int(count) for category, count in df['category'].value_counts().items()}
             
-            # Category insights
+            # Category insights (single groupby instead of a re-scan per category)
+            price_agg = df.groupby('category')['price'].agg(['mean', 'min', 'max']).fillna(0).to_dict(orient='index')
             category_insights = {}
             for category, count in categories.items():
-                category_products = [p for p in all_products if p.get('category') == category]
-                category_prices = [p.get('price', 0) for p in category_products if p.get('price')]
-                
+                agg = price_agg[category]
                 category_insights[category] = {
                     'count': count,
                     'percentage': round((count / total_products) * 100, 2),
-                    'avg_price': float(np.mean(category_prices)) if category_prices else 0,
+                    'avg_price': float(agg['mean']),
                     'price_range': {
-                        'min': float(np.min(category_prices)) if category_prices else 0,
-                        'max': float(np.max(category_prices)) if category_prices else 0
+                        'min': float(agg['min']),
+                        'max': float(agg['max'])
                     }
                 }
             
             return {
-                'total_products': total_products,
                 'categories': categories,
-                'category_insights': category_insights,
+                'category_insights': category_insights
+            }
+            
+        except Exception as e:
+            raise Exception(f"Error getting category stats: {str(e)}")
+    
+    def get_price_stats(self) -> Dict:
+        """Get overall price statistics and price range bucket counts."""
+        try:
+            df = self._get_products_frame()
+            if df.empty:
+                return {'price_statistics': {}, 'price_ranges': {}}
+            
+            # Price statistics
+            prices = df['price'].dropna().to_numpy(dtype=np.float64)
+            price_stats = {
+                'min': float(prices.min()) if prices.size else 0,
+                'max': float(prices.max()) if prices.size else 0,
+                'mean': float(prices.mean()) if prices.size else 0,
+                'median': float(np.median(prices)) if prices.size else 0,
+                'std': float(prices.std()) if prices.size else 0
+            }
+            
+            # Price ranges: bucket 0 = budget (<200), 1 = mid (<800), 2 = premium
+            bucket_counts = np.bincount(np.searchsorted(PRICE_RANGE_EDGES, prices, side='right'), minlength=3)
+            price_ranges = {
+                'budget': int(bucket_counts[0]),
+                'mid_range': int(bucket_counts[1]),
+                'premium': int(bucket_counts[2])
+            }
+            
+            return {
                 'price_statistics': price_stats,
-                'price_ranges': price_ranges,
-                'recommendation_insights': self._get_recommendation_insights()
+                'price_ranges': price_ranges
             }
             
         except Exception as e:
-            raise Exception(f"Error getting analytics metrics: {str(e)}")
+            raise Exception(f"Error getting price stats: {str(e)}")
     
     def get_similarity_analysis(self, product_id: str) -> Dict:
         """Analyze similarity patterns for a specific product."""
@@ -158,7 +242,11 @@ class AnalyticsService:
                 }
             
             # Analyze similarity scores
-            similarity_scores = [p['similarity_score'] for p in similar_products]
+            similarity_scores = np.fromiter(
+                (p['similarity_score'] for p in similar_products),
+                dtype=np.float64,
+                count=len(similar_products)
+            )
             
             # Category distribution of similar products
             category_dist = {}
@@ -170,26 +258,30 @@ class AnalyticsService:
             target_product = self.product_service.get_product_by_id(product_id)
             target_price = target_product.get('price', 0) if target_product else 0
             
-            similar_prices = [p.get('price', 0) for p in similar_products]
+            similar_prices = np.fromiter(
+                (p.get('price', 0) for p in similar_products),
+                dtype=np.float64,
+                count=len(similar_products)
+            )
             price_similarity = {
                 'target_price': target_price,
-                'similar_prices': similar_prices,
-                'price_variance': float(np.var(similar_prices)) if similar_prices else 0,
+                'similar_prices': similar_prices.tolist(),
+                'price_variance': float(similar_prices.var()),
                 'price_range': {
-                    'min': float(np.min(similar_prices)) if similar_prices else 0,
-                    'max': float(np.max(similar_prices)) if similar_prices else 0
+                    'min': float(similar_prices.min()),
+                    'max': float(similar_prices.max())
                 }
             }
             
             return {
                 'product_id': product_id,
                 'target_product': target_product,
-                'similarity_scores': similarity_scores,
+                'similarity_scores': similarity_scores.tolist(),
                 'similarity_statistics': {
-                    'mean': float(np.mean(similarity_scores)),
-                    'std': float(np.std(similarity_scores)),
-                    'min': float(np.min(similarity_scores)),
-                    'max': float(np.max(similarity_scores))
+                    'mean': float(similarity_scores.mean()),
+                    'std': float(similarity_scores.std()),
+                    'min': float(similarity_scores.min()),
+                    'max': float(similarity_scores.max())
                 },
                 'category_distribution': category_dist,
                 'price_similarity': price_similarity
@@ -210,26 +302,10 @@ class AnalyticsService:
                 "storage solutions"
             ]
             
-            quality_metrics = []
-            
-            for query in test_queries:
-                try:
-                    recommendations = self.recommendation_service.get_recommendations(
-                        query=query,
-                        top_k=5
-                    )
-                    
-                    if recommendations:
-                        quality_analysis = self.recommendation_service.analyze_recommendation_quality(
-                            recommendations
-                        )
-                        quality_metrics.append({
-                            'query': query,
-                            'quality_analysis': quality_analysis
-                        })
-                except Exception as e:
-                    print(f"Error testing query '{query}': {str(e)}")
-                    continue
+            # Each query is an embedding + Pinecone round trip; fan them out
+            with ThreadPoolExecutor(max_workers=len(test_queries)) as executor:
+                results = executor.map(self._analyze_test_query, test_queries)
+            quality_metrics = [result for result in results if result]
             
             return {
                 'test_queries': len(test_queries),
@@ -241,7 +317,26 @@ class AnalyticsService:
         except Exception as e:
             raise Exception(f"Error getting recommendation quality metrics: {str(e)}")
     
-    def _get_recommendation_insights(self) -> Dict:
+    def _analyze_test_query(self, query: str) -> Optional[Dict]:
+        """Run one sample query and analyze its recommendations."""
+        try:
+            recommendations = self.recommendation_service.get_recommendations(
+                query=query,
+                top_k=5
+            )
+            
+            if recommendations:
+                return {
+                    'query': query,
+                    'quality_analysis': self.recommendation_service.analyze_recommendation_quality(
+                        recommendations
+                    )
+                }
+        except Exception as e:
+            logger.debug("Error testing query '%s': %s", query, e)
+        return None
+    
+    def get_recommendation_insights(self) -> Dict:
         """Get insights about the recommendation system."""
         try:
             # Placeholder values; wire up analytics events in production.
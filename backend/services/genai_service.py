@@ -3,50 +3,410 @@
 Falls back to simple template-based generation if the model is unavailable.
 """
 
+import asyncio
+import copy
+import hashlib
+import logging
+import os
 import re
-from typing import Dict, Optional
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
 
-from transformers import GPT2LMHeadModel, GPT2Tokenizer, pipeline
+import torch
+from transformers import GPT2LMHeadModel, GPT2Tokenizer
+from transformers.pytorch_utils import Conv1D
 
 from core.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Concurrent prompts are coalesced into one generate call of up to this many,
+# waiting at most this long (seconds) for the batch to fill
+MAX_BATCH_SIZE = 8
+MAX_BATCH_WAIT = 0.010
+# Upper bound (seconds) a request waits on the batch worker for its result
+GENERATION_TIMEOUT = 60.0
+
+# Greedy (do_sample=False) results are deterministic and kept in an LRU of this size
+GENERATION_CACHE_SIZE = 2048
+
+# Any whitespace run (newlines included) collapses to a single space
+_WHITESPACE_RE = re.compile(r"\s+")
+
 class GenAIService:
+    # Category-specific prompt templates; the text before {name} is prefix-cached
+    _CATEGORY_PROMPTS = {
+        'sofa': "Create a compelling description for a {name} sofa that emphasizes comfort, style, and durability:",
+        'chair': "Write an engaging description for a {name} chair that highlights ergonomics and design:",
+        'table': "Describe a {name} table focusing on functionality, craftsmanship, and versatility:",
+        'bed': "Create a cozy description for a {name} bed that emphasizes comfort and quality sleep:",
+        'desk': "Write a professional description for a {name} desk that highlights productivity and organization:",
+        'storage': "Describe a {name} storage solution that emphasizes organization and space efficiency:"
+    }
+    _DEFAULT_CATEGORY_PROMPT = "Create a compelling description for a {name} {category}:"
+    
+    # Template-based descriptions used when the model is unavailable
+    _CATEGORY_TEMPLATES = {
+        'sofa': "The {name} is a beautifully crafted sofa that combines comfort and style. Perfect for your living room, it offers exceptional comfort and durability.",
+        'chair': "The {name} chair features ergonomic design and premium materials. Ideal for both work and relaxation.",
+        'table': "The {name} table is a versatile piece that combines functionality with elegant design. Perfect for dining, work, or display.",
+        'bed': "The {name} bed provides the perfect foundation for a good night's sleep. Crafted with quality materials and attention to detail.",
+        'desk': "The {name} desk offers a perfect workspace solution with its clean design and practical features.",
+        'storage': "The {name} storage solution helps you organize your space efficiently while maintaining a stylish appearance."
+    }
+    _DEFAULT_CATEGORY_TEMPLATE = "The {name} is a high-quality {category} that combines style and functionality. Perfect for modern homes and offices."
+    
     def __init__(self):
         self.model_name = settings.GENAI_MODEL
-        self.generator = None
+        self.model = None
         self.tokenizer = None
+        # Optional draft model for assisted decoding (torch backend only)
+        self.draft_model = None
+        # Micro-batching state; created lazily on the serving event loop
+        self._queue: Optional[asyncio.Queue] = None
+        self._batch_task: Optional[asyncio.Task] = None
+        # Prompt prefix -> (input_ids, past_key_values) for category prompts, filled on
+        # first use; only enabled for the torch backend without a draft model
+        self._prefix_cache: Dict[str, Tuple] = {}
+        self._prefix_cache_enabled = False
+        # Serializes every call into the model (batch worker and prefix path)
+        self._model_lock = threading.Lock()
+        # blake2b(prompt, settings) -> generated text, for greedy generations only
+        self._result_cache: "OrderedDict[str, str]" = OrderedDict()
         self._load_model()
     
     def _load_model(self):
         """Load the GPT-2 model and tokenizer."""
+        # Process-wide; set before the first model loads so prefill/compile use it too
+        if settings.TORCH_NUM_THREADS > 0:
+            torch.set_num_threads(settings.TORCH_NUM_THREADS)
+        
         try:
             # Load model and tokenizer
             self.tokenizer = GPT2Tokenizer.from_pretrained(self.model_name)
-            self.model = GPT2LMHeadModel.from_pretrained(self.model_name)
             
             # Add padding token if it doesn't exist
             if self.tokenizer.pad_token is None:
                 self.tokenizer.pad_token = self.tokenizer.eos_token
+            # Decoder-only models must be left-padded for batched generation
+            self.tokenizer.padding_side = "left"
             
-            # Create text generation pipeline
-            self.generator = pipeline(
-                "text-generation",
-                model=self.model,
-                tokenizer=self.tokenizer,
-                pad_token_id=self.tokenizer.eos_token_id,
-                max_length=150,
-                do_sample=True,
-                temperature=0.8,
-                top_p=0.9,
-                repetition_penalty=1.1
-            )
+            if settings.GENAI_BACKEND == "onnx":
+                self.model = self._load_onnx_model()
+            else:
+                self.model = self._load_torch_model()
+                if settings.ENABLE_COMPILE and hasattr(torch, "compile"):
+                    self._compile_model()
+                if settings.GENAI_DRAFT_MODEL:
+                    self.draft_model = self._load_draft_model()
+                # Assisted decoding can't start from a prefilled cache, so with a
+                # draft model every prompt goes through the batch worker instead
+                self._prefix_cache_enabled = self.draft_model is None
             
-        except Exception as e:
+        except Exception:
+            if settings.GENAI_BACKEND == "onnx":
+                # Explicitly requested backend: fail startup instead of serving templates
+                logger.exception("Could not load %s with the ONNX backend", self.model_name)
+                raise
             # Log and continue with fallback
-            print(f"Warning: Could not load {self.model_name}. Using fallback generator.")
-            self.generator = None
+            logger.exception("Could not load %s. Using fallback generator.", self.model_name)
+            self.model = None
+    
+    def _load_torch_model(self) -> GPT2LMHeadModel:
+        """Load the PyTorch model with the fastest precision for the device."""
+        # Half-precision weights with fused SDPA attention: FP16 on GPU, BF16 on CPUs
+        # with native BF16 (elsewhere it is emulated and slower than FP32).
+        # CPU INT8 quantization needs FP32 weights to start from.
+        use_cuda = torch.cuda.is_available()
+        quantize = settings.QUANTIZE_GENAI and not use_cuda
+        if use_cuda:
+            dtype = torch.float16
+        elif quantize or not self._cpu_supports_bf16():
+            dtype = torch.float32
+        else:
+            dtype = torch.bfloat16
+        model = GPT2LMHeadModel.from_pretrained(
+            self.model_name,
+            torch_dtype=dtype,
+            attn_implementation="sdpa"
+        )
+        
+        if use_cuda:
+            model = model.to("cuda")
+        else:
+            torch.set_float32_matmul_precision("high")
+        model.eval()
+        
+        if quantize:
+            model = self._quantize_int8(model)
+        
+        return model
+    
+    @staticmethod
+    def _cpu_supports_bf16() -> bool:
+        """Whether the CPU runs BF16 matmuls natively (AVX512-BF16 / AMX)."""
+        try:
+            return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+        except Exception:
+            return False
+    
+    def _load_draft_model(self) -> Optional[GPT2LMHeadModel]:
+        """Load the draft model used to propose tokens for assisted decoding."""
+        try:
+            draft = GPT2LMHeadModel.from_pretrained(
+                settings.GENAI_DRAFT_MODEL,
+                torch_dtype=self.model.dtype,
+                attn_implementation="sdpa"
+            ).to(self.model.device)
+            draft.eval()
+            return draft
+        except Exception:
+            # The main model still works on its own
+            logger.exception("Could not load draft model %s", settings.GENAI_DRAFT_MODEL)
+            return None
+    
+    def _compile_model(self):
+        """Compile the model's forward pass and warm it up before serving.
+        
+        Only forward is compiled so generate() and the rest of the
+        GPT2LMHeadModel interface keep working on the same object. Any failure
+        restores the eager forward rather than disabling the model.
+        """
+        eager_forward = self.model.forward
+        try:
+            # "default" mode: no CUDA graphs, which are unsafe across executor threads
+            self.model.forward = torch.compile(eager_forward, mode="default", fullgraph=False)
+            self._generate_batch(["Warmup"], max_new_tokens=8, do_sample=False)
+        except Exception as e:
+            self.model.forward = eager_forward
+            logger.warning("torch.compile failed, using the eager model: %s", e)
+    
+    def _load_onnx_model(self):
+        """Load an INT8-quantized ONNX Runtime export of the model.
+        
+        The export and quantization run once; the result is cached under
+        MODEL_CACHE_DIRECTORY and reused on later starts.
+        """
+        # Optional dependency, only needed for GENAI_BACKEND=onnx
+        from optimum.onnxruntime import ORTModelForCausalLM, ORTQuantizer
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        
+        cache_name = self.model_name.replace("/", "--")
+        export_dir = os.path.join(settings.MODEL_CACHE_DIRECTORY, f"{cache_name}-onnx")
+        quantized_dir = os.path.join(settings.MODEL_CACHE_DIRECTORY, f"{cache_name}-onnx-int8")
+        
+        if not os.path.isdir(quantized_dir):
+            ort_model = ORTModelForCausalLM.from_pretrained(self.model_name, export=True, use_cache=True)
+            ort_model.save_pretrained(export_dir)
+            
+            quantizer = ORTQuantizer.from_pretrained(export_dir, file_name="model.onnx")
+            quantizer.quantize(
+                save_dir=quantized_dir,
+                quantization_config=AutoQuantizationConfig.avx512_vnni(is_static=False, per_channel=False)
+            )
+        
+        return ORTModelForCausalLM.from_pretrained(
+            quantized_dir,
+            file_name="model_quantized.onnx",
+            use_cache=True
+        )
+    
+    @staticmethod
+    def _quantize_int8(model: GPT2LMHeadModel) -> GPT2LMHeadModel:
+        """Apply dynamic INT8 quantization to the model's linear layers.
+        
+        GPT-2 implements its attention/MLP projections as transformers'
+        Conv1D (a transposed Linear), which quantize_dynamic does not
+        recognise, so those are swapped for equivalent nn.Linear first.
+        """
+        for module in list(model.modules()):
+            for name, child in module.named_children():
+                if isinstance(child, Conv1D):
+                    in_features, out_features = child.weight.shape
+                    linear = torch.nn.Linear(in_features, out_features)
+                    linear.weight.data = child.weight.data.t().contiguous()
+                    linear.bias.data = child.bias.data
+                    setattr(module, name, linear)
+        
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    
+    def _generation_kwargs(self, max_new_tokens: int, temperature: float, do_sample: bool) -> Dict:
+        """Decoding settings shared by every generate call."""
+        kwargs = {
+            'max_new_tokens': max_new_tokens,
+            # Single-beam decoding; beam search multiplies the per-step cost
+            'num_beams': 1,
+            'do_sample': do_sample,
+            'repetition_penalty': 1.1,
+            'pad_token_id': self.tokenizer.eos_token_id,
+            'use_cache': True
+        }
+        # Sampling controls are ignored (and warned about) under greedy decoding
+        if do_sample:
+            kwargs.update(temperature=temperature, top_p=0.9)
+        return kwargs
     
-    def generate_creative_description(
+    @staticmethod
+    def _prompt_prefix(template: str) -> str:
+        """Static text of a category prompt template before the product name."""
+        return template.split("{name}")[0].rstrip()
+    
+    def _prefix_state(self, prefix: str) -> Tuple:
+        """Get (input_ids, past_key_values) for a prompt prefix, prefilling it on first use.
+        
+        Callers must hold _model_lock.
+        """
+        if prefix not in self._prefix_cache:
+            inputs = self.tokenizer(prefix, return_tensors="pt").to(self.model.device)
+            with torch.inference_mode():
+                output = self.model(**inputs, use_cache=True)
+            self._prefix_cache[prefix] = (inputs["input_ids"], output.past_key_values)
+        return self._prefix_cache[prefix]
+    
+    def _generate_with_prefix(
+        self,
+        prefix: str,
+        prompt: str,
+        max_new_tokens: int,
+        temperature: float = 0.8,
+        do_sample: bool = True
+    ) -> Optional[str]:
+        """Generate from a cached prefix so only the rest of the prompt needs prefilling.
+        
+        Returns None when the prompt's tokens don't start with the cached prefix
+        tokens (BPE merged across the boundary); the caller then generates normally.
+        """
+        input_ids = self.tokenizer(prompt, return_tensors="pt")["input_ids"].to(self.model.device)
+        
+        with self._model_lock:
+            prefix_ids, prefix_past = self._prefix_state(prefix)
+            prefix_len = prefix_ids.shape[1]
+            if input_ids.shape[1] <= prefix_len or not torch.equal(input_ids[0, :prefix_len], prefix_ids[0]):
+                return None
+            
+            with torch.inference_mode():
+                output = self.model.generate(
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    # generate() extends the cache in place, so hand it a copy
+                    past_key_values=copy.deepcopy(prefix_past),
+                    **self._generation_kwargs(max_new_tokens, temperature, do_sample)
+                )
+        
+        return self.tokenizer.decode(output[0, input_ids.shape[1]:], skip_special_tokens=True)
+    
+    async def _submit(
+        self,
+        prompt: str,
+        max_new_tokens: int,
+        temperature: float = 0.8,
+        do_sample: bool = True
+    ) -> str:
+        """Queue a prompt for the batch worker and wait for its continuation."""
+        config = (max_new_tokens, temperature, do_sample)
+        
+        # Greedy decoding is deterministic, so repeated prompts can be served from cache
+        cache_key = None
+        if not do_sample:
+            cache_key = hashlib.blake2b(f"{config}\0{prompt}".encode(), digest_size=16).hexdigest()
+            if cache_key in self._result_cache:
+                self._result_cache.move_to_end(cache_key)
+                return self._result_cache[cache_key]
+        
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        # (Re)start the worker if it has not started yet or has died
+        if self._batch_task is None or self._batch_task.done():
+            self._batch_task = asyncio.create_task(self._batch_worker())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((prompt, config, future))
+        result = await asyncio.wait_for(future, GENERATION_TIMEOUT)
+        
+        if cache_key is not None:
+            self._result_cache[cache_key] = result
+            if len(self._result_cache) > GENERATION_CACHE_SIZE:
+                self._result_cache.popitem(last=False)
+        return result
+    
+    async def _batch_worker(self):
+        """Coalesce queued prompts into padded model.generate batches."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = []
+            try:
+                # Block for the first prompt, then collect more for a few ms
+                batch.append(await self._queue.get())
+                deadline = loop.time() + MAX_BATCH_WAIT
+                while len(batch) < MAX_BATCH_SIZE:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+                
+                # Prompts only share a generate call when their decoding settings match
+                groups: Dict[Tuple, List] = {}
+                for prompt, config, future in batch:
+                    groups.setdefault(config, []).append((prompt, future))
+                
+                for config, items in groups.items():
+                    prompts = [prompt for prompt, _ in items]
+                    try:
+                        outputs = await loop.run_in_executor(None, self._generate_batch, prompts, *config)
+                    except Exception as e:
+                        self._fail_pending(items, e)
+                        continue
+                    
+                    for (_, future), output in zip(items, outputs):
+                        if not future.done():
+                            future.set_result(output)
+            
+            except asyncio.CancelledError:
+                # Shutting down: don't leave callers waiting on their futures
+                self._fail_pending(
+                    [(prompt, future) for prompt, _, future in batch],
+                    RuntimeError("Generation worker stopped")
+                )
+                raise
+            except Exception as e:
+                # Keep serving later batches; fail only the ones in flight
+                logger.exception("Generation batch worker error")
+                self._fail_pending([(prompt, future) for prompt, _, future in batch], e)
+    
+    @staticmethod
+    def _fail_pending(items: List[Tuple[str, asyncio.Future]], error: BaseException):
+        """Set an exception on every (prompt, future) pair that has no result yet."""
+        for _, future in items:
+            if not future.done():
+                future.set_exception(error)
+    
+    def _generate_batch(
+        self,
+        prompts: List[str],
+        max_new_tokens: int,
+        temperature: float = 0.8,
+        do_sample: bool = True
+    ) -> List[str]:
+        """Generate continuations for a batch of prompts and return only the new text."""
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True).to(self.model.device)
+        generation_kwargs = self._generation_kwargs(max_new_tokens, temperature, do_sample)
+        
+        # Assisted decoding only supports a batch size of one
+        if self.draft_model is not None and len(prompts) == 1:
+            generation_kwargs['assistant_model'] = self.draft_model
+        
+        with self._model_lock, torch.inference_mode():
+            output = self.model.generate(**inputs, **generation_kwargs)
+        
+        # Decode only the generated continuations, not the echoed (left-padded) prompts
+        new_tokens = output[:, inputs["input_ids"].shape[1]:]
+        return self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+    
+    async def generate_creative_description(
         self, 
         product_name: str, 
         category: str, 
@@ -55,25 +415,15 @@ class GenAIService:
     ) -> str:
         """Generate a creative marketing description for a product."""
         try:
-            if not self.generator:
+            if self.model is None:
                 return self._generate_fallback_description(product_name, category, original_description)
             
             # Create a prompt for the model
             prompt = self._create_prompt(product_name, category, original_description, features)
             
-            # Generate text
-            result = self.generator(
-                prompt,
-                max_length=len(prompt.split()) + 50,  # Add 50 words to the prompt
-                num_return_sequences=1,
-                temperature=0.8,
-                do_sample=True,
-                pad_token_id=self.tokenizer.eos_token_id
-            )
-            
-            # Extract and clean the generated text
-            generated_text = result[0]['generated_text']
-            description = self._extract_description(generated_text, prompt)
+            # Generate and clean the continuation
+            generated_text = await self._submit(prompt, max_new_tokens=50, temperature=0.8)
+            description = self._clean_description(generated_text)
             
             return description
             
@@ -81,30 +431,23 @@ class GenAIService:
             print(f"Error generating description: {str(e)}")
             return self._generate_fallback_description(product_name, category, original_description)
     
-    def enhance_existing_description(
+    async def enhance_existing_description(
         self, 
         product_name: str, 
         original_description: str
     ) -> str:
         """Enhance an existing product description with creative marketing copy."""
         try:
-            if not self.generator:
+            if self.model is None:
                 return self._enhance_fallback_description(product_name, original_description)
             
             # Create enhancement prompt
             prompt = f"Enhance this product description to be more engaging and marketing-focused:\n\nProduct: {product_name}\nOriginal: {original_description}\n\nEnhanced description:"
             
             # Generate enhanced description
-            result = self.generator(
-                prompt,
-                max_length=len(prompt.split()) + 30,
-                num_return_sequences=1,
-                temperature=0.7,
-                do_sample=True
-            )
-            
-            generated_text = result[0]['generated_text']
-            enhanced_description = self._extract_description(generated_text, prompt)
+            # Greedy decoding: a near-deterministic rewrite needs no sampling
+            generated_text = await self._submit(prompt, max_new_tokens=30, temperature=1.0, do_sample=False)
+            enhanced_description = self._clean_description(generated_text)
             
             return enhanced_description
             
@@ -112,37 +455,35 @@ class GenAIService:
             print(f"Error enhancing description: {str(e)}")
             return self._enhance_fallback_description(product_name, original_description)
     
-    def generate_category_specific_description(
+    async def generate_category_specific_description(
         self, 
         product_name: str, 
         category: str
     ) -> str:
         """Generate a description tailored to a specific furniture category."""
         try:
-            category_prompts = {
-                'sofa': f"Create a compelling description for a {product_name} sofa that emphasizes comfort, style, and durability:",
-                'chair': f"Write an engaging description for a {product_name} chair that highlights ergonomics and design:",
-                'table': f"Describe a {product_name} table focusing on functionality, craftsmanship, and versatility:",
-                'bed': f"Create a cozy description for a {product_name} bed that emphasizes comfort and quality sleep:",
-                'desk': f"Write a professional description for a {product_name} desk that highlights productivity and organization:",
-                'storage': f"Describe a {product_name} storage solution that emphasizes organization and space efficiency:"
-            }
-            
-            prompt = category_prompts.get(category.lower(), f"Create a compelling description for a {product_name} {category}:")
-            
-            if not self.generator:
+            # Dataset categories are breadcrumbs like "Home, Furniture, Sofas"
+            category_lower = category.lower()
+            template = self._CATEGORY_PROMPTS.get(category_lower) or next(
+                (prompt for key, prompt in self._CATEGORY_PROMPTS.items() if key in category_lower),
+                None
+            )
+            
+            if self.model is None:
                 return self._generate_fallback_description(product_name, category, "")
             
-            result = self.generator(
-                prompt,
-                max_length=len(prompt.split()) + 40,
-                num_return_sequences=1,
-                temperature=0.8,
-                do_sample=True
-            )
+            prompt = (template or self._DEFAULT_CATEGORY_PROMPT).format(name=product_name, category=category)
+            
+            generated_text = None
+            if template and self._prefix_cache_enabled:
+                # Reuse the prefilled prefix; only the product-name part is new
+                generated_text = await asyncio.get_running_loop().run_in_executor(
+                    None, self._generate_with_prefix, self._prompt_prefix(template), prompt, 40
+                )
+            if generated_text is None:
+                generated_text = await self._submit(prompt, max_new_tokens=40, temperature=0.8)
             
-            generated_text = result[0]['generated_text']
-            description = self._extract_description(generated_text, prompt)
+            description = self._clean_description(generated_text)
             
             return description
             
@@ -170,14 +511,9 @@ class GenAIService:
         prompt += "Creative marketing description:"
         return prompt
     
-    def _extract_description(self, generated_text: str, prompt: str) -> str:
-        """Extract the description from the generated text."""
-        # Remove the prompt from the generated text
-        description = generated_text.replace(prompt, "").strip()
-        
-        # Clean up the description
-        description = re.sub(r'\n+', ' ', description)  # Replace multiple newlines with space
-        description = re.sub(r'\s+', ' ', description)  # Replace multiple spaces with single space
+    def _clean_description(self, generated_text: str) -> str:
+        """Normalize whitespace and punctuation in generated text."""
+        description = _WHITESPACE_RE.sub(" ", generated_text).strip()
         
         # Ensure it ends with a period
         if description and not description.endswith(('.', '!', '?')):
@@ -192,19 +528,8 @@ class GenAIService:
         original_description: str
     ) -> str:
         """Generate a fallback description when the model is not available."""
-        category_templates = {
-            'sofa': f"The {product_name} is a beautifully crafted sofa that combines comfort and style. Perfect for your living room, it offers exceptional comfort and durability.",
-            'chair': f"The {product_name} chair features ergonomic design and premium materials. Ideal for both work and relaxation.",
-            'table': f"The {product_name} table is a versatile piece that combines functionality with elegant design. Perfect for dining, work, or display.",
-            'bed': f"The {product_name} bed provides the perfect foundation for a good night's sleep. Crafted with quality materials and attention to detail.",
-            'desk': f"The {product_name} desk offers a perfect workspace solution with its clean design and practical features.",
-            'storage': f"The {product_name} storage solution helps you organize your space efficiently while maintaining a stylish appearance."
-        }
-        
-        if category.lower() in category_templates:
-            return category_templates[category.lower()]
-        
-        return f"The {product_name} is a high-quality {category} that combines style and functionality. Perfect for modern homes and offices."
+        template = self._CATEGORY_TEMPLATES.get(category.lower(), self._DEFAULT_CATEGORY_TEMPLATE)
+        return template.format(name=product_name, category=category)
     
     def _enhance_fallback_description(self, product_name: str, original_description: str) -> str:
         """Enhance description using fallback method."""
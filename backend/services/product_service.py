@@ -5,49 +5,123 @@ interacting with the Pinecone vector database.
 """
 
 import ast
+import functools
 import json
+import logging
+import math
 import os
+import tempfile
+from itertools import chain, islice
 from pathlib import Path
-from typing import List, Dict, Optional, Tuple
+from typing import Iterator, List, Dict, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+import torch
 from pinecone import Pinecone, ServerlessSpec
 from sentence_transformers import SentenceTransformer
 
 from core.config import settings
 
+logger = logging.getLogger(__name__)
+
+# Raw dataset values (lower-cased, stripped) that mean "missing"
+NULL_STRINGS = frozenset({'nan', 'none', '', 'null'})
+
+# str.translate table removing currency symbols and separators from prices
+_PRICE_STRIP_TABLE = str.maketrans('', '', '$, ')
+
+# Pinecone caps request size (~2MB / ~100 vectors of this shape), so upserts are
+# split into batches sent concurrently over a pool of connections
+UPSERT_BATCH_SIZE = 100
+UPSERT_POOL_THREADS = 8
+# Ids per fetch request when reading vectors back without a local mirror
+FETCH_BATCH_SIZE = 100
+# Products embedded per step while earlier steps' upserts are in flight
+EMBED_CHUNK_SIZE = 1000
+
+# Distinct search queries whose embeddings are kept in memory
+QUERY_EMBEDDING_CACHE_SIZE = 4096
+
+# Pre-quantized INT8 exports shipped alongside sentence-transformers hub models
+EMBEDDING_BACKEND_KWARGS = {
+    'onnx': {'file_name': 'onnx/model_qint8_avx512_vnni.onnx', 'provider': 'CPUExecutionProvider'},
+    'openvino': {'file_name': 'openvino/openvino_model_qint8_quantized.xml'},
+}
+
+# EMBEDDING_PRECISION -> torch weight dtype for the torch embedding backend
+EMBEDDING_TORCH_DTYPES = {'bf16': torch.bfloat16, 'fp16': torch.float16}
+
+def _chunks(items: List, size: int) -> Iterator[List]:
+    """Yield successive lists of at most `size` items."""
+    iterator = iter(items)
+    return iter(lambda: list(islice(iterator, size)), [])
+
 class ProductService:
     def __init__(self):
         self.pc = Pinecone(api_key=settings.PINECONE_API_KEY)
-        self.embedding_model = SentenceTransformer(settings.EMBEDDING_MODEL)
         self.index_name = settings.PINECONE_INDEX_NAME
+        # Index handle, resolved on first use so construction makes no network calls
+        self._index = None
         self.products_data = []
+        # (file mtime, DataFrame) for the local Parquet mirror of the index
+        self._mirror_cache: Optional[Tuple[float, pd.DataFrame]] = None
+        # (file mtime, contiguous float32 N x D matrix) of the mirror's embeddings, in row order
+        self._embedding_matrix_cache: Optional[Tuple[float, np.ndarray]] = None
+        # (file mtime, category -> unit-length mean embedding) derived from the mirror
+        self._category_centroids: Optional[Tuple[float, Dict[str, np.ndarray]]] = None
+        # Query text -> embedding; popular searches skip the encoder entirely
+        self._embed_query = functools.lru_cache(maxsize=QUERY_EMBEDDING_CACHE_SIZE)(self._encode_query)
+    
+    @functools.cached_property
+    def embedding_model(self) -> SentenceTransformer:
+        """Sentence embedding model, loaded on first use rather than at import."""
+        # Process-wide; a no-op if the GenAI service already applied it
+        if settings.TORCH_NUM_THREADS > 0:
+            torch.set_num_threads(settings.TORCH_NUM_THREADS)
+        
+        backend = settings.EMBEDDING_BACKEND
+        precision = settings.EMBEDDING_PRECISION
+        if precision == 'fp16' and not torch.cuda.is_available():
+            # Half-precision matmuls are slow or unsupported on CPU
+            logger.warning("EMBEDDING_PRECISION=fp16 needs CUDA; using fp32")
+            precision = 'fp32'
+        
+        if backend == 'openvino' and precision == 'bf16':
+            # Full-precision export run with BF16 inference instead of the INT8 one
+            model_kwargs = {'ov_config': {'INFERENCE_PRECISION_HINT': 'bf16'}}
+        elif backend in EMBEDDING_BACKEND_KWARGS:
+            if precision != 'fp32':
+                # The INT8 exports fix their own precision
+                logger.warning("EMBEDDING_PRECISION=%s is ignored by the %s embedding backend", precision, backend)
+            model_kwargs = EMBEDDING_BACKEND_KWARGS[backend]
+        else:
+            model_kwargs = {}
+            if precision in EMBEDDING_TORCH_DTYPES:
+                model_kwargs['torch_dtype'] = EMBEDDING_TORCH_DTYPES[precision]
+        
+        model = SentenceTransformer(settings.EMBEDDING_MODEL, backend=backend, model_kwargs=model_kwargs)
+        if settings.EMBEDDING_MAX_SEQ_LENGTH > 0:
+            # Bounds the padded batch shape (and attention cost) for long descriptions
+            model.max_seq_length = settings.EMBEDDING_MAX_SEQ_LENGTH
+        return model
         
     def clean_price(self, price_str: str) -> float:
         """Clean price string and convert to float."""
-        # Handle None, NaN, or empty values first
-        if price_str is None or str(price_str).lower() in ['nan', 'none', '', 'null']:
+        if price_str is None:
             return 0.0
         
         if isinstance(price_str, (int, float)):
-            try:
-                if pd.isna(price_str):
-                    return 0.0
-                return float(price_str)
-            except (TypeError, ValueError):
-                return 0.0
+            return 0.0 if math.isnan(price_str) else float(price_str)
         
-        # Convert to string and clean
+        # Convert to string; treat null-like strings as missing
         price_str = str(price_str).strip()
-        if not price_str or price_str.lower() in ['nan', 'none', '', 'null']:
+        if price_str.lower() in NULL_STRINGS:
             return 0.0
         
-        # Remove dollar signs, commas, and other non-numeric characters except decimal point
-        cleaned = price_str.replace('$', '').replace(',', '').strip()
-        
         try:
-            return float(cleaned)
+            # Drop dollar signs, commas and spaces in one pass
+            return float(price_str.translate(_PRICE_STRIP_TABLE))
         except ValueError:
             # If conversion fails, return 0.0
             print(f"Warning: Could not convert price '{price_str}' to float, using 0.0")
@@ -55,19 +129,17 @@ class ProductService:
     
     def parse_categories(self, categories_str: str) -> str:
         """Parse categories string and return a clean string."""
-        # Handle None, NaN, or empty values first
-        if categories_str is None or str(categories_str).lower() in ['nan', 'none', '', 'null']:
+        if categories_str is None:
             return "Unknown"
         
-        # Convert to string
+        # Convert to string; treat null-like strings as missing
         categories_str = str(categories_str).strip()
-        if not categories_str or categories_str.lower() in ['nan', 'none', '', 'null']:
+        if categories_str.lower() in NULL_STRINGS:
             return "Unknown"
         
         # If it's already a string representation of a list, parse it
         if categories_str.startswith('['):
             try:
-                import ast
                 categories_list = ast.literal_eval(categories_str)
                 return ', '.join(categories_list) if isinstance(categories_list, list) else categories_str
             except:
@@ -77,19 +149,17 @@ class ProductService:
     
     def parse_images(self, images_str: str) -> str:
         """Parse images string and return the first image URL."""
-        # Handle None, NaN, or empty values first
-        if images_str is None or str(images_str).lower() in ['nan', 'none', '', 'null']:
+        if images_str is None:
             return ""
         
-        # Convert to string
+        # Convert to string; treat null-like strings as missing
         images_str = str(images_str).strip()
-        if not images_str or images_str.lower() in ['nan', 'none', '', 'null']:
+        if images_str.lower() in NULL_STRINGS:
             return ""
         
         # If it's already a string representation of a list, parse it
         if images_str.startswith('['):
             try:
-                import ast
                 images_list = ast.literal_eval(images_str)
                 return images_list[0] if isinstance(images_list, list) and len(images_list) > 0 else ""
             except:
@@ -105,17 +175,25 @@ class ProductService:
             self.pc.create_index(
                 name=self.index_name,
                 dimension=settings.EMBEDDING_DIMENSION,
-                metric="cosine",
+                # Embeddings are L2-normalized, so dot product equals cosine similarity
+                metric="dotproduct",
                 spec=ServerlessSpec(cloud="aws", region=settings.PINECONE_ENVIRONMENT)
             )
         
         return self.index_name
     
+    def get_index(self):
+        """Get the shared Pinecone Index handle, creating the index on first use."""
+        if self._index is None:
+            self._index = self.pc.Index(self.get_or_create_index(), pool_threads=UPSERT_POOL_THREADS)
+        return self._index
+    
     def load_dataset(self, file_path: str) -> List[Dict]:
         """Load furniture dataset from CSV or JSON file."""
         try:
             if file_path.endswith('.csv'):
-                df = pd.read_csv(file_path)
+                # Multithreaded Arrow CSV parser; cleaning below stays vectorized in pandas
+                df = pd.read_csv(file_path, engine='pyarrow')
             elif file_path.endswith('.json'):
                 df = pd.read_json(file_path)
             else:
@@ -127,28 +205,32 @@ class ProductService:
             if missing_columns:
                 raise ValueError(f"Missing required columns: {missing_columns}")
             
-            # Convert to list of dictionaries
+            # Normalize null-like strings ("nan", "None", "", ...) once per column
+            text_columns = df.select_dtypes(include='object').columns
+            null_like = df[text_columns].apply(lambda col: col.str.strip().str.lower().isin(NULL_STRINGS))
+            df[text_columns] = df[text_columns].mask(null_like).fillna('')
+            
+            # Clean prices with vectorized string ops instead of per-row parsing
+            df['price'] = pd.to_numeric(
+                df['price'].astype(str).str.replace(r'[\$,]', '', regex=True).str.strip(),
+                errors='coerce'
+            ).fillna(0.0)
+            
+            # Only list-literal cells need ast parsing; everything else is already clean
+            categories = df['categories'].astype(str)
+            list_mask = categories.str.startswith('[')
+            df.loc[list_mask, 'categories'] = categories[list_mask].map(self.parse_categories)
+            df['categories'] = df['categories'].replace('', 'Unknown')
+            
+            if 'images' in df.columns:
+                images = df['images'].astype(str)
+                list_mask = images.str.startswith('[')
+                df['image_url'] = images.where(~list_mask, images[list_mask].map(self.parse_images))
+            
             # Convert to list of dictionaries
             products = df.to_dict('records')
             self.products_data = products
             
-            # Parse selected fields into convenient shapes
-            for product in products:
-                # Parse categories if it's a string representation of a list
-                if isinstance(product.get('categories'), str) and product['categories'].startswith('['):
-                    try:
-                        product['categories'] = ast.literal_eval(product['categories'])
-                    except:
-                        pass  # Keep as string if parsing fails
-                
-                # Parse images if it's a string representation of a list
-                if isinstance(product.get('images'), str) and product['images'].startswith('['):
-                    try:
-                        images_list = ast.literal_eval(product['images'])
-                        product['image_url'] = images_list[0] if images_list else ''
-                    except:
-                        product['image_url'] = product.get('images', '')
-                    
             return products
             
         except Exception as e:
@@ -156,58 +238,206 @@ class ProductService:
     
     def generate_embeddings(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings for a list of texts."""
-        return self.embedding_model.encode(texts)
+        return self.embedding_model.encode(texts, normalize_embeddings=True, convert_to_numpy=True)
+    
+    def _encode_query(self, query: str) -> np.ndarray:
+        """Embed a single search query (wrapped by the _embed_query LRU cache)."""
+        embedding = self.generate_embeddings([query])[0].astype(np.float32, copy=False)
+        # Shared between callers through the cache, so guard against mutation
+        embedding.flags.writeable = False
+        return embedding
     
     def store_products_in_pinecone(self, products: List[Dict]) -> bool:
         """Store product embeddings in Pinecone vector database."""
         try:
-            index_name = self.get_or_create_index()
-            index = self.pc.Index(index_name)
+            index = self.get_index()
             
-            # Prepare vectors for Pinecone
-            vectors = []
+            # Parse each product's fields once; reused for the embedding text and metadata
+            ids = []
+            metadata_list = []
             for i, product in enumerate(products):
-                # Create text for embedding (combine name, category, description)
-                text_for_embedding = f"{product.get('title', '')} {self.parse_categories(product.get('categories', ''))} {product.get('description', '')}"
-                
-                # Generate embedding
-                embedding = self.embedding_model.encode([text_for_embedding])[0]
-                
-                # Prepare metadata
-                metadata = {
+                ids.append(str(product['uniq_id']))
+                metadata_list.append({
                     'name': str(product.get('title', 'Unknown Product')),
                     'category': self.parse_categories(product.get('categories', '')),
                     'price': self.clean_price(product.get('price', 0)),
                     'description': str(product.get('description', '')),
-                    'image_url': self.parse_images(product.get('images', '')),
+                    'image_url': self.parse_images(product.get('image_url', product.get('images', ''))),
                     'product_id': str(product.get('uniq_id', f'unknown_{i}')),
                     'brand': str(product.get('brand', '')),
                     'material': str(product.get('material', '')),
                     'color': str(product.get('color', ''))
-                }
-                
-                vectors.append({
-                    'id': str(product['uniq_id']),
-                    'values': embedding.tolist(),
-                    'metadata': metadata
                 })
             
-            # Upsert vectors to Pinecone
-            index.upsert(vectors=vectors)
+            # Create texts for embedding (combine name, category, description)
+            # The raw title (not the 'Unknown Product' display default) keeps the text,
+            # and therefore the stored vectors, identical to earlier ingests
+            texts = [
+                f"{product.get('title', '')} {metadata['category']} {metadata['description']}"
+                for product, metadata in zip(products, metadata_list)
+            ]
+            
+            # Encode in document chunks and fire each chunk's upserts without waiting,
+            # so the next chunk is embedded while the previous one is uploading
+            async_results = []
+            embedding_chunks = []
+            try:
+                for start in range(0, len(texts), EMBED_CHUNK_SIZE):
+                    stop = start + EMBED_CHUNK_SIZE
+                    chunk_embeddings = self.embedding_model.encode(
+                        texts[start:stop],
+                        batch_size=64,
+                        normalize_embeddings=True,
+                        convert_to_numpy=True,
+                        show_progress_bar=False
+                    ).astype(np.float32, copy=False)
+                    embedding_chunks.append(chunk_embeddings)
+                    
+                    # Rows stay numpy until the SDK serializes them
+                    vectors = [
+                        {'id': vector_id, 'values': embedding, 'metadata': metadata}
+                        for vector_id, embedding, metadata in zip(ids[start:stop], chunk_embeddings, metadata_list[start:stop])
+                    ]
+                    async_results.extend(
+                        index.upsert(vectors=batch, async_req=True)
+                        for batch in _chunks(vectors, UPSERT_BATCH_SIZE)
+                    )
+                
+                for result in async_results:
+                    result.get()
+                
+                embeddings = np.concatenate(embedding_chunks) if embedding_chunks else np.empty((0, settings.EMBEDDING_DIMENSION), dtype=np.float32)
+                
+                # Mirror metadata + embeddings locally for listing and analytics reads
+                self._update_local_mirror(ids=ids, metadata=metadata_list, embeddings=embeddings)
+            except Exception:
+                if async_results:
+                    # Pinecone may now hold vectors from this run that the mirror lacks;
+                    # drop the mirror so reads fall back to Pinecone until the next ingest
+                    self._invalidate_local_mirror()
+                raise
             
             return True
             
         except Exception as e:
             raise Exception(f"Error storing products in Pinecone: {str(e)}")
     
-    def search_similar_products(self, query: str, top_k: int = 5, filters: Optional[Dict] = None) -> List[Dict]:
-        """Search for similar products using vector similarity."""
+    def _load_local_mirror(self) -> Optional[pd.DataFrame]:
+        """Load the local product mirror, reusing the in-memory copy until the file changes."""
+        path = settings.PRODUCT_MIRROR_PATH
+        if not os.path.exists(path):
+            return None
+        
+        mtime = os.path.getmtime(path)
+        if self._mirror_cache is None or self._mirror_cache[0] != mtime:
+            self._mirror_cache = (mtime, pd.read_parquet(path))
+        return self._mirror_cache[1]
+    
+    def _get_embedding_matrix(self) -> Optional[np.ndarray]:
+        """Get the mirror's embeddings as one contiguous float32 matrix, aligned with its rows.
+        
+        The per-row arrays in the Parquet column are stacked (and dequantized)
+        once per mirror version instead of on every read.
+        """
+        mirror = self._load_local_mirror()
+        if mirror is None:
+            return None
+        
+        mtime = self._mirror_cache[0]
+        if self._embedding_matrix_cache is None or self._embedding_matrix_cache[0] != mtime:
+            if len(mirror):
+                embeddings = np.vstack(mirror['embedding'].to_numpy()).astype(np.float32, copy=False)
+                if 'embedding_scale' in mirror:
+                    # Dequantize int8 rows; float rows carry no scale
+                    scales = mirror['embedding_scale'].fillna(1.0).to_numpy(dtype=np.float32)
+                    embeddings = embeddings * scales[:, None]
+                embeddings = np.ascontiguousarray(embeddings)
+            else:
+                embeddings = np.empty((0, settings.EMBEDDING_DIMENSION), dtype=np.float32)
+            # Shared by every caller until the mirror changes
+            embeddings.flags.writeable = False
+            self._embedding_matrix_cache = (mtime, embeddings)
+        return self._embedding_matrix_cache[1]
+    
+    def get_category_centroid(self, category: str) -> Optional[np.ndarray]:
+        """Get the normalized mean embedding of a category's products from the local mirror."""
+        embeddings = self._get_embedding_matrix()
+        if embeddings is None or not len(embeddings):
+            return None
+        
+        mtime, mirror = self._mirror_cache
+        if self._category_centroids is None or self._category_centroids[0] != mtime:
+            # All centroids in one pass: sum rows per category code, then normalize
+            # Missing categories count as 'Unknown' (as in analytics) rather than getting
+            # factorize's -1 code, which np.add.at would fold into the last category
+            codes, categories = pd.factorize(mirror['category'].fillna('Unknown'))
+            sums = np.zeros((len(categories), embeddings.shape[1]), dtype=np.float32)
+            np.add.at(sums, codes, embeddings)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.where(norms == 0, 1.0, norms)
+            self._category_centroids = (mtime, dict(zip(categories, centroids)))
+        return self._category_centroids[1].get(category)
+    
+    def _invalidate_local_mirror(self):
+        """Delete the local mirror and everything derived from it."""
+        if os.path.exists(settings.PRODUCT_MIRROR_PATH):
+            os.remove(settings.PRODUCT_MIRROR_PATH)
+        self._mirror_cache = None
+        self._embedding_matrix_cache = None
+        self._category_centroids = None
+    
+    def _update_local_mirror(self, ids: List[str], metadata: List[Dict], embeddings: np.ndarray):
+        """Merge upserted products into the local Parquet mirror of the index."""
+        new_rows = pd.DataFrame(metadata)
+        new_rows.insert(0, 'id', ids)
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if settings.MIRROR_EMBEDDING_DTYPE == "int8":
+            # Symmetric per-row quantization: v ~= q * scale with q in [-127, 127]
+            scales = np.abs(embeddings).max(axis=1) / 127
+            scales[scales == 0] = 1.0
+            new_rows['embedding'] = list(np.round(embeddings / scales[:, None]).astype(np.int8))
+            new_rows['embedding_scale'] = scales.astype(np.float32)
+        else:
+            new_rows['embedding'] = list(embeddings)
+        
+        # Repeated ids within one upload collapse to a single vector in Pinecone (last wins)
+        new_rows = new_rows.drop_duplicates('id', keep='last')
+        
+        existing = self._load_local_mirror()
+        if existing is not None:
+            # Upserts overwrite: drop stale rows for re-uploaded ids
+            new_rows = pd.concat([existing[~existing['id'].isin(ids)], new_rows], ignore_index=True)
+        
+        # Write to a temp file and swap it in so readers never see a partial file
+        mirror_dir = os.path.dirname(settings.PRODUCT_MIRROR_PATH) or '.'
+        os.makedirs(mirror_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=mirror_dir, suffix='.parquet.tmp', delete=False) as tmp:
+            tmp_path = tmp.name
+        try:
+            new_rows.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, settings.PRODUCT_MIRROR_PATH)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+    
+    def search_similar_products(
+        self,
+        query: str,
+        top_k: int = 5,
+        filters: Optional[Dict] = None,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[Dict]:
+        """Search for similar products using vector similarity.
+        
+        A precomputed query_embedding, when given, is used instead of embedding query.
+        """
         try:
-            index_name = self.get_or_create_index()
-            index = self.pc.Index(index_name)
+            index = self.get_index()
             
             # Generate embedding for query
-            query_embedding = self.embedding_model.encode([query])[0]
+            if query_embedding is None:
+                query_embedding = self._embed_query(query)
             
             # Search in Pinecone
             search_params = {
@@ -236,38 +466,76 @@ class ProductService:
         except Exception as e:
             raise Exception(f"Error searching similar products: {str(e)}")
     
+    def search_similar_to_product(self, product_id: str, top_k: int = 5) -> List[Dict]:
+        """Search for products similar to a stored product, using its indexed vector."""
+        try:
+            index = self.get_index()
+            
+            # Query by vector id; the stored embedding is used server-side
+            results = index.query(id=product_id, top_k=top_k, include_metadata=True)
+            
+            return [
+                {'id': match.id, 'similarity_score': match.score, **match.metadata}
+                for match in results.matches
+            ]
+            
+        except Exception as e:
+            raise Exception(f"Error searching products similar to {product_id}: {str(e)}")
+    
     def get_all_products(self, limit: int = 100, offset: int = 0) -> List[Dict]:
         """Get all products with pagination."""
         try:
-            index_name = self.get_or_create_index()
-            index = self.pc.Index(index_name)
-            
-            # Query all vectors
-            results = index.query(
-                vector=[0.0] * settings.EMBEDDING_DIMENSION,  # Dummy vector
-                top_k=limit + offset,
-                include_metadata=True
-            )
+            mirror = self._load_local_mirror()
+            if mirror is not None:
+                return mirror.drop(columns=['embedding', 'embedding_scale'], errors='ignore').iloc[offset:offset + limit].to_dict('records')
+            
+            # No local mirror yet (index populated elsewhere); page via Pinecone
+            index = self.get_index()
             
-            # Format and paginate results
+            # Enumerate ids (no ANN search) and fetch metadata for this page only
+            page_ids = list(islice(chain.from_iterable(index.list()), offset, offset + limit))
+            if not page_ids:
+                return []
+            results = index.fetch(ids=page_ids)
+            
+            # Format results in listing order
             products = []
-            for match in results.matches[offset:offset + limit]:
-                product = {
-                    'id': match.id,
-                    **match.metadata
-                }
-                products.append(product)
+            for product_id in page_ids:
+                if product_id in results.vectors:
+                    products.append({
+                        'id': product_id,
+                        **results.vectors[product_id].metadata
+                    })
             
             return products
             
         except Exception as e:
             raise Exception(f"Error getting all products: {str(e)}")
     
+    def get_top_priced_products(self, top_k: int) -> List[Dict]:
+        """Get the highest-priced products, most expensive first."""
+        try:
+            mirror = self._load_local_mirror()
+            if mirror is not None:
+                return mirror.nlargest(top_k, 'price').drop(columns=['embedding', 'embedding_scale'], errors='ignore').to_dict('records')
+            
+            # No local mirror yet; rank a page of products fetched from Pinecone
+            products = self.get_all_products(limit=100)
+            if len(products) <= top_k:
+                return sorted(products, key=lambda x: x.get('price', 0), reverse=True)
+            
+            # Partial selection of the top_k prices, then order only those
+            prices = np.fromiter((p.get('price', 0) for p in products), dtype=np.float64, count=len(products))
+            top = np.argpartition(-prices, top_k)[:top_k]
+            return [products[i] for i in top[np.argsort(-prices[top], kind='stable')]]
+            
+        except Exception as e:
+            raise Exception(f"Error getting top priced products: {str(e)}")
+    
     def get_product_by_id(self, product_id: str) -> Optional[Dict]:
         """Get a specific product by ID."""
         try:
-            index_name = self.get_or_create_index()
-            index = self.pc.Index(index_name)
+            index = self.get_index()
             
             # Fetch specific vector
             results = index.fetch(ids=[product_id])
@@ -287,30 +555,30 @@ class ProductService:
     def get_embeddings_for_analytics(self) -> Tuple[np.ndarray, List[Dict]]:
         """Get all embeddings and metadata for analytics visualization."""
         try:
-            index_name = self.get_or_create_index()
-            index = self.pc.Index(index_name)
-            
-            # Get all vectors
-            results = index.query(
-                vector=[0.0] * settings.EMBEDDING_DIMENSION,
-                top_k=10000,  # Large number to get all
-                include_metadata=True
-            )
+            mirror = self._load_local_mirror()
+            if mirror is not None:
+                embeddings = self._get_embedding_matrix()
+                return embeddings, mirror.drop(columns=['embedding', 'embedding_scale'], errors='ignore').to_dict('records')
+            
+            # No local mirror yet (index populated elsewhere); read via Pinecone
+            index = self.get_index()
             
+            # Enumerate every id and fetch values in batches; query() caps top_k at
+            # 1000 when values are included
             embeddings = []
             metadata = []
+            for batch_ids in _chunks(list(chain.from_iterable(index.list())), FETCH_BATCH_SIZE):
+                results = index.fetch(ids=batch_ids)
+                for product_id in batch_ids:
+                    if product_id in results.vectors:
+                        vector = results.vectors[product_id]
+                        embeddings.append(vector.values)
+                        metadata.append({
+                            'id': product_id,
+                            **vector.metadata
+                        })
             
-            for match in results.matches:
-                # Reconstruct embedding from Pinecone (this is a simplified approach)
-                # In practice, you might want to store embeddings separately for analytics
-                embeddings.append([0.0] * settings.EMBEDDING_DIMENSION)  # Placeholder
-                metadata.append({
-                    'id': match.id,
-                    'similarity_score': match.score,
-                    **match.metadata
-                })
-            
-            return np.array(embeddings), metadata
+            return np.array(embeddings, dtype=np.float32).reshape(-1, settings.EMBEDDING_DIMENSION), metadata
             
         except Exception as e:
             raise Exception(f"Error getting embeddings for analytics: {str(e)}")
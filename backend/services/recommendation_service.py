@@ -3,15 +3,24 @@
 Thin orchestration around vector search results and lightweight re-scoring.
 """
 
+import bisect
+import math
 from typing import List, Dict, Optional, Tuple
 
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
 # Local services/config
 from core.config import settings
 from services.product_service import product_service
 
+# Similarity tiers: scores strictly above each threshold move up one reason
+SIMILARITY_THRESHOLDS = (0.7, 0.8, 0.9)
+SIMILARITY_REASONS = ("", "Similar to your search", "Very similar to your search", "Highly similar to your search")
+
+# Price tiers: < 200 is great value, > 1000 is premium (1000 itself is neither)
+PRICE_THRESHOLDS = (200.0, math.nextafter(1000.0, math.inf))
+PRICE_REASONS = ("Great value", "", "Premium quality")
+
 class RecommendationService:
     def __init__(self):
         self.product_service = product_service
@@ -43,31 +52,24 @@ class RecommendationService:
             # Search for similar products
             similar_products = self.product_service.search_similar_products(
                 query=query,
-                top_k=top_k * 2,  # Get more to filter later
+                top_k=top_k,
                 filters=filters if filters else None
             )
             
-            # Apply additional filtering and scoring
+            # Matches arrive sorted by score, so everything after the first one
+            # below the threshold is below it too
             filtered_products = []
-            print(f"DEBUG: Current similarity threshold: {settings.SIMILARITY_THRESHOLD}")
-            print(f"DEBUG: Found {len(similar_products)} similar products")
             for product in similar_products:
-                print(f"DEBUG: Product {product.get('name', 'Unknown')} - Similarity: {product['similarity_score']:.3f}")
-                # Apply similarity threshold
-                if product['similarity_score'] >= settings.SIMILARITY_THRESHOLD:
-                    # Add recommendation metadata
-                    product['recommendation_reason'] = self._get_recommendation_reason(
-                        query, product, product['similarity_score']
-                    )
-                    filtered_products.append(product)
-                else:
-                    print(f"DEBUG: Filtered out due to low similarity: {product['similarity_score']:.3f} < {settings.SIMILARITY_THRESHOLD}")
+                if product['similarity_score'] < settings.SIMILARITY_THRESHOLD:
+                    break
+                
+                # Add recommendation metadata
+                product['recommendation_reason'] = self._get_recommendation_reason(
+                    query, product, product['similarity_score']
+                )
+                filtered_products.append(product)
             
-            print(f"DEBUG: After filtering: {len(filtered_products)} products")
-            
-            # Sort by similarity score and return top_k
-            filtered_products.sort(key=lambda x: x['similarity_score'], reverse=True)
-            return filtered_products[:top_k]
+            return filtered_products
             
         except Exception as e:
             raise Exception(f"Error getting recommendations: {str(e)}")
@@ -82,20 +84,27 @@ class RecommendationService:
         try:
             top_k = top_k or settings.DEFAULT_TOP_K
             
-            # Get the target product
-            target_product = self.product_service.get_product_by_id(product_id)
-            if not target_product:
-                raise ValueError(f"Product with ID {product_id} not found")
-            
-            # Create query from product attributes
-            query = f"{target_product['name']} {target_product['category']} {target_product.get('description', '')}"
-            
-            # Get similar products
-            similar_products = self.product_service.search_similar_products(
-                query=query,
-                top_k=top_k + 1 if exclude_self else top_k  # +1 to account for self
+            # Query with the product's stored vector; no re-embedding needed
+            similar_products = self.product_service.search_similar_to_product(
+                product_id=product_id,
+                top_k=top_k + 1  # +1 to account for self
             )
             
+            # The target is normally its own best match
+            target_product = next((p for p in similar_products if p['id'] == product_id), None)
+            if target_product is None:
+                target_product = self.product_service.get_product_by_id(product_id)
+                if not target_product:
+                    raise ValueError(f"Product with ID {product_id} not found")
+                
+                # Not in the index results; fall back to a text query from its attributes
+                if not similar_products:
+                    query = f"{target_product['name']} {target_product['category']} {target_product.get('description', '')}"
+                    similar_products = self.product_service.search_similar_products(
+                        query=query,
+                        top_k=top_k + 1
+                    )
+            
             # Filter out the original product if requested
             if exclude_self:
                 similar_products = [p for p in similar_products if p['id'] != product_id]
@@ -130,11 +139,13 @@ class RecommendationService:
                     price_filter['$lte'] = price_max
                 filters['price'] = price_filter
             
-            # Search with category filter
+            # Search with category filter, ranked against the category's centroid
+            # when the local mirror has one (no query encoding needed)
             similar_products = self.product_service.search_similar_products(
-                query=category,  # Use category as query
+                query=category,  # Use category as query otherwise
                 top_k=top_k,
-                filters=filters
+                filters=filters,
+                query_embedding=self.product_service.get_category_centroid(category)
             )
             
             # Add recommendation metadata
@@ -151,49 +162,28 @@ class RecommendationService:
         try:
             top_k = top_k or settings.DEFAULT_TOP_K
             
-            # Get all products and sort by price (as a proxy for popularity)
+            # Use price as a proxy for popularity (higher price = more premium = trending)
             # In a real implementation, you'd use actual popularity metrics
-            all_products = self.product_service.get_all_products(limit=100)
-            
-            # Sort by price (higher price = more premium = trending)
-            trending_products = sorted(
-                all_products, 
-                key=lambda x: x.get('price', 0), 
-                reverse=True
-            )
+            trending_products = self.product_service.get_top_priced_products(top_k)
             
             # Add recommendation metadata
-            for product in trending_products[:top_k]:
+            for product in trending_products:
                 product['recommendation_reason'] = "Trending product"
                 product['similarity_score'] = 0.9  # High score for trending
             
-            return trending_products[:top_k]
+            return trending_products
             
         except Exception as e:
             raise Exception(f"Error getting trending products: {str(e)}")
     
     def _get_recommendation_reason(self, query: str, product: Dict, similarity_score: float) -> str:
         """Generate a human-readable reason for the recommendation."""
-        reasons = []
-        
-        # Similarity-based reason
-        if similarity_score > 0.9:
-            reasons.append("Highly similar to your search")
-        elif similarity_score > 0.8:
-            reasons.append("Very similar to your search")
-        elif similarity_score > 0.7:
-            reasons.append("Similar to your search")
-        
-        # Category-based reason
-        if product.get('category'):
-            reasons.append(f"Popular in {product['category']} category")
-        
-        # Price-based reason
-        price = product.get('price', 0)
-        if price > 1000:
-            reasons.append("Premium quality")
-        elif price < 200:
-            reasons.append("Great value")
+        reasons = (
+            SIMILARITY_REASONS[bisect.bisect_left(SIMILARITY_THRESHOLDS, similarity_score)],
+            f"Popular in {category} category" if (category := product.get('category')) else "",
+            PRICE_REASONS[bisect.bisect_right(PRICE_THRESHOLDS, product.get('price', 0))]
+        )
+        reasons = [reason for reason in reasons if reason]
         
         return "; ".join(reasons) if reasons else "Recommended for you"
     
@@ -207,20 +197,25 @@ class RecommendationService:
                 'price_range': {'min': 0, 'max': 0}
             }
         
-        similarities = [r['similarity_score'] for r in recommendations]
-        categories = [r.get('category', '') for r in recommendations]
-        prices = [r.get('price', 0) for r in recommendations]
+        # One pass into a (similarity, price) record array
+        stats = np.fromiter(
+            ((r['similarity_score'], r.get('price', 0)) for r in recommendations),
+            dtype=[('similarity', np.float64), ('price', np.float64)],
+            count=len(recommendations)
+        )
+        similarities = stats['similarity']
+        prices = stats['price']
         
         return {
             'total_recommendations': len(recommendations),
-            'average_similarity': np.mean(similarities),
-            'max_similarity': np.max(similarities),
-            'min_similarity': np.min(similarities),
-            'category_diversity': len(set(categories)),
+            'average_similarity': float(similarities.mean()),
+            'max_similarity': float(similarities.max()),
+            'min_similarity': float(similarities.min()),
+            'category_diversity': len({r.get('category', '') for r in recommendations}),
             'price_range': {
-                'min': np.min(prices),
-                'max': np.max(prices),
-                'mean': np.mean(prices)
+                'min': float(prices.min()),
+                'max': float(prices.max()),
+                'mean': float(prices.mean())
             }
         }
 
@@ -34,6 +34,7 @@ export interface Product {
 export interface GenerateDescriptionRequest {
   product_id: string;
   enhance_existing: boolean;
+  category_specific?: boolean;
 }
 
 export interface GenerateDescriptionResponse {
@@ -72,6 +73,12 @@ export interface Embedding2DResponse {
   explained_variance_ratio?: number[];
 }
 
+export interface ProductEmbeddings {
+  rows: number;
+  cols: number;
+  values: Float32Array;
+}
+
 // API Functions
 /** Fetch recommendations for a user query. */
 export async function getRecommendations(request: RecommendationRequest): Promise<RecommendationResponse> {
@@ -168,6 +175,18 @@ export async function getProduct(productId: string): Promise<Product> {
   return response.json();
 }
 
+/** Fetch raw product embeddings (row-major float32, shape in X-Shape header). */
+export async function getProductEmbeddings(): Promise<ProductEmbeddings> {
+  const response = await fetch(`${API_BASE_URL}/api/products/embeddings`);
+
+  if (!response.ok) {
+    throw new Error(`HTTP error! status: ${response.status}`);
+  }
+
+  const [rows, cols] = (response.headers.get('X-Shape') || '0,0').split(',').map(Number);
+  return { rows, cols, values: new Float32Array(await response.arrayBuffer()) };
+}
+
 // Analytics API Functions
 /** Analytics: overall metrics */
 export async function getAnalyticsMetrics(): Promise<AnalyticsMetrics> {